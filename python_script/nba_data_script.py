@@ -1,10 +1,51 @@
+import atexit
+import base64
 import boto3
+import botocore.session
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from functools import lru_cache
+import gzip
+import hashlib
+import io
 import json
+import logging
+import queue
+import sys
+import threading
 import time
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import os
 
+try:
+    import orjson  # C extension JSON encoder, much faster than stdlib
+except ImportError:
+    orjson = None  # Fall back to stdlib json when the wheel isn't installed
+
+try:
+    import simdjson  # SIMD-accelerated JSON parser for large API responses
+    _simdjson_parser = simdjson.Parser()  # Reused across calls to amortize allocation
+except ImportError:
+    _simdjson_parser = None
+
+try:
+    import zstandard as zstd  # Fast compression to shrink the S3 upload
+except ImportError:
+    zstd = None  # Fall back to stdlib gzip when the wheel isn't installed
+
+try:
+    import ijson  # Incremental parser for streaming the API response to S3
+except ImportError:
+    ijson = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -14,20 +55,104 @@ bucket_name = "sports-analytics-data-lake-421"  # Change to a unique S3 bucket n
 glue_database_name = "glue_nba_data_lake"
 athena_output_location = f"s3://{bucket_name}/athena-results/"
 
+# S3 paths computed (and interned) once; the object key suffix follows
+# whichever compression codec is available at import
+_RAW_LOCATION = sys.intern(f"s3://{bucket_name}/raw-data/")
+_FILE_KEY = sys.intern(
+    "raw-data/nba_player_data.jsonl.zst"
+    if zstd is not None
+    else "raw-data/nba_player_data.jsonl.gz"
+)
+
 # Sportsdata.io configurations (loaded from .env)
 api_key = os.getenv("SPORTS_DATA_API_KEY")  # Get API key from .env
 nba_endpoint = os.getenv("NBA_ENDPOINT")  # Get NBA endpoint from .env
 
+# Share one botocore session so endpoint/service data is parsed only once,
+# instead of every boto3.client() call re-reading config and model files
+_botocore_session = botocore.session.Session()
+_botocore_session.set_config_variable("region", region)
+_boto3_session = boto3.Session(botocore_session=_botocore_session)
+
+# Skip the SigV4 SHA-256 pass over the upload body; over TLS the payload
+# goes out as UNSIGNED-PAYLOAD, saving a full scan of the buffer
+_S3_CONFIG = Config(
+    signature_version="s3v4", s3={"payload_signing_enabled": False}
+)
+
+@lru_cache(maxsize=None)
+def _aws_client(service_name):
+    """Return a cached AWS client built from the shared session."""
+    config = _S3_CONFIG if service_name == "s3" else None
+    return _boto3_session.client(service_name, config=config)
+
 # Create AWS clients
-s3_client = boto3.client("s3", region_name=region)
-glue_client = boto3.client("glue", region_name=region)
-athena_client = boto3.client("athena", region_name=region)
-logs_client = boto3.client("logs", region_name=region)
+s3_client = _aws_client("s3")
+glue_client = _aws_client("glue")
+athena_client = _aws_client("athena")
+logs_client = _aws_client("logs")
+
+# Pooled HTTP session so repeated fetches reuse the TCP/TLS connection
+_session = requests.Session()
+_session.headers["Ocp-Apim-Subscription-Key"] = api_key
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504]
+        ),
+    ),
+)
+
+# Multipart transfer settings so large uploads parallelize across threads
+_transfer_config = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+)
+
+# Glue table definition and Athena result config, built once at import
+# instead of reallocating the nested dicts on every (re)try
+_TABLE_INPUT = {
+    "Name": "nba_players",
+    "StorageDescriptor": {
+        "Columns": [
+            {"Name": "PlayerID", "Type": "int"},
+            {"Name": "FirstName", "Type": "string"},
+            {"Name": "LastName", "Type": "string"},
+            {"Name": "Team", "Type": "string"},
+            {"Name": "Position", "Type": "string"},
+            {"Name": "Points", "Type": "int"},
+        ],
+        "Location": _RAW_LOCATION,
+        "InputFormat": "org.apache.hadoop.mapred.TextInputFormat",
+        "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+        "SerdeInfo": {
+            "SerializationLibrary": "org.openx.data.jsonserde.JsonSerDe"
+        },
+    },
+    "TableType": "EXTERNAL_TABLE",
+    "Parameters": {
+        "classification": "json",
+        "compressionType": "zstd" if zstd is not None else "gzip",
+    },
+}
+_ATHENA_RESULT_CONFIG = {"OutputLocation": athena_output_location}
 
 # CloudWatch log group and stream configurations
 log_group_name = "NBAAnalyticsLogGroup"
 log_stream_name = "NBAAnalyticsLogStream"
 
+# Buffer log events and flush them in batches instead of one API call each
+_log_buffer = []
+_log_lock = threading.Lock()
+_log_flush_event = threading.Event()
+_LOG_FLUSH_INTERVAL = 2.0  # Seconds between background flushes
+_LOG_FLUSH_BATCH_SIZE = 20  # Flush early once this many events are queued
+
 def initialize_cloudwatch_logging():
     """Set up CloudWatch log group and stream."""
     try:
@@ -45,20 +170,72 @@ def initialize_cloudwatch_logging():
         pass  # Log stream already exists
 
 def log_to_cloudwatch(message):
-    """Log a message to CloudWatch."""
+    """Queue a message for CloudWatch; events are flushed in batches."""
+    # time_ns avoids the float multiply/round of int(time.time() * 1000)
+    event = {"timestamp": time.time_ns() // 1_000_000, "message": message}
+    with _log_lock:
+        _log_buffer.append(event)
+        if len(_log_buffer) >= _LOG_FLUSH_BATCH_SIZE:
+            _log_flush_event.set()  # Wake the flusher early
+
+def _flush_log_buffer():
+    """Send all buffered log events to CloudWatch in a single API call."""
+    with _log_lock:
+        batch = _log_buffer[:]
+        del _log_buffer[:]
+    if not batch:
+        return
     try:
-        timestamp = int(time.time() * 1000)  # Current timestamp in milliseconds
         logs_client.put_log_events(
             logGroupName=log_group_name,
             logStreamName=log_stream_name,
-            logEvents=[{"timestamp": timestamp, "message": message}],
+            logEvents=sorted(batch, key=itemgetter("timestamp")),
         )
     except Exception as e:
         print(f"Error logging to CloudWatch: {e}")
 
+def _run_log_flusher():
+    """Background loop that drains the log buffer periodically."""
+    while True:
+        _log_flush_event.wait(_LOG_FLUSH_INTERVAL)
+        _log_flush_event.clear()
+        _flush_log_buffer()
+
+threading.Thread(target=_run_log_flusher, daemon=True).start()
+atexit.register(_flush_log_buffer)  # Drain whatever is left on shutdown
+
+class _CloudWatchHandler(logging.Handler):
+    """Forward formatted log records into the batched CloudWatch buffer."""
+
+    def emit(self, record):
+        log_to_cloudwatch(self.format(record))
+
+# Route log records through a queue so the main thread never blocks on
+# console or CloudWatch IO; the listener handles both off the hot path
+logger = logging.getLogger("nba_data_lake")
+logger.setLevel(logging.INFO)
+_log_queue = queue.Queue(-1)
+logger.addHandler(QueueHandler(_log_queue))
+_log_listener = QueueListener(
+    _log_queue,
+    logging.StreamHandler(),
+    _CloudWatchHandler(),
+    respect_handler_level=True,
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 def create_s3_bucket():
     """Create an S3 bucket for storing sports data."""
     try:
+        # A HEAD probe is much cheaper than a create call that errors out
+        try:
+            s3_client.head_bucket(Bucket=bucket_name)
+            logger.info(f"S3 bucket '{bucket_name}' already exists.")
+            return
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "404":
+                raise
         if region == "us-east-1":
             s3_client.create_bucket(Bucket=bucket_name)
         else:
@@ -66,53 +243,65 @@ def create_s3_bucket():
                 Bucket=bucket_name,
                 CreateBucketConfiguration={"LocationConstraint": region},
             )
-        message = f"S3 bucket '{bucket_name}' created successfully."
-        print(message)
-        log_to_cloudwatch(message)
+        logger.info(f"S3 bucket '{bucket_name}' created successfully.")
     except Exception as e:
-        message = f"Error creating S3 bucket: {e}"
-        print(message)
-        log_to_cloudwatch(message)
+        logger.error(f"Error creating S3 bucket: {e}")
 
 def create_glue_database():
     """Create a Glue database for the data lake."""
     try:
+        try:
+            glue_client.get_database(Name=glue_database_name)
+            logger.info(f"Glue database '{glue_database_name}' already exists.")
+            return
+        except glue_client.exceptions.EntityNotFoundException:
+            pass
         glue_client.create_database(
             DatabaseInput={
                 "Name": glue_database_name,
                 "Description": "Glue database for NBA sports analytics.",
             }
         )
-        message = f"Glue database '{glue_database_name}' created successfully."
-        print(message)
-        log_to_cloudwatch(message)
+        logger.info(f"Glue database '{glue_database_name}' created successfully.")
     except Exception as e:
-        message = f"Error creating Glue database: {e}"
-        print(message)
-        log_to_cloudwatch(message)
+        logger.error(f"Error creating Glue database: {e}")
 
 def fetch_nba_data():
     """Fetch NBA player data from sportsdata.io."""
     try:
-        headers = {"Ocp-Apim-Subscription-Key": api_key}
-        response = requests.get(nba_endpoint, headers=headers)
+        response = _session.get(nba_endpoint, timeout=(3.05, 30))
         response.raise_for_status()  # Raise an error for bad status codes
-        message = "Fetched NBA data successfully."
-        print(message)
-        log_to_cloudwatch(message)
-        return response.json()  # Return JSON response
+        logger.info("Fetched NBA data successfully.")
+        return parse_nba_response(response.content)
     except Exception as e:
-        message = f"Error fetching NBA data: {e}"
-        print(message)
-        log_to_cloudwatch(message)
+        logger.error(f"Error fetching NBA data: {e}")
         return []
 
+def parse_nba_response(content):
+    """Parse the raw API response bytes into Python objects."""
+    # For small payloads the simdjson FFI overhead dominates, so stick to
+    # orjson/stdlib there and only use the SIMD parser on larger bodies.
+    if _simdjson_parser is not None and len(content) >= 64_000:
+        parsed = _simdjson_parser.parse(content)
+        if isinstance(parsed, simdjson.Array):
+            return parsed.as_list()
+        return parsed.as_dict()
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
 def convert_to_line_delimited_json(data):
     """Convert data to line-delimited JSON format."""
-    message = "Converting data to line-delimited JSON format..."
-    print(message)
-    log_to_cloudwatch(message)
-    return "\n".join([json.dumps(record) for record in data])
+    logger.info("Converting data to line-delimited JSON format...")
+    if orjson is not None:
+        # Serialize the whole list in one orjson call, then convert the JSON
+        # array to JSONL with a single C-level scan: strip the enclosing
+        # brackets and split on the '},{' record boundary. The boundary
+        # can't occur inside a record because the API returns flat dicts.
+        return orjson.dumps(data)[1:-1].replace(b"},{", b"}\n{")
+    return "\n".join(
+        json.dumps(record, separators=(",", ":")) for record in data
+    ).encode("utf-8")
 
 def upload_data_to_s3(data):
     """Upload NBA data to the S3 bucket."""
@@ -120,86 +309,200 @@ def upload_data_to_s3(data):
         # Convert data to line-delimited JSON
         line_delimited_data = convert_to_line_delimited_json(data)
 
-        # Define S3 object key
-        file_key = "raw-data/nba_player_data.jsonl"
+        # Compress before upload; JSONL is highly redundant, so this cuts
+        # the bytes on the wire (and the put time) by several times
+        if zstd is not None:
+            body = zstd.ZstdCompressor(level=3, threads=-1).compress(
+                line_delimited_data
+            )
+            extra_args = {"ContentEncoding": "zstd"}
+        else:
+            # Stdlib fallback: gzip level 1 still shrinks JSONL ~3-4x at
+            # a fraction of the saved network time
+            body = gzip.compress(line_delimited_data, compresslevel=1, mtime=0)
+            extra_args = {
+                "ContentEncoding": "gzip",
+                "ContentType": "application/x-ndjson",
+            }
 
-        # Upload JSON data to S3
-        s3_client.put_object(
+        # Upload JSON data to S3. With payload signing disabled, a single
+        # precomputed MD5 is the only pass over the body; the transfer
+        # manager doesn't accept ContentMD5, so it only handles bodies
+        # large enough to benefit from multipart
+        if len(body) < _transfer_config.multipart_threshold:
+            content_md5 = base64.b64encode(hashlib.md5(body).digest()).decode()
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=_FILE_KEY,
+                Body=body,
+                ContentMD5=content_md5,
+                **extra_args,
+            )
+        else:
+            s3_client.upload_fileobj(
+                Fileobj=io.BytesIO(body),
+                Bucket=bucket_name,
+                Key=_FILE_KEY,
+                ExtraArgs=extra_args,
+                Config=_transfer_config,
+            )
+        logger.info(f"Uploaded data to S3: {_FILE_KEY}")
+    except Exception as e:
+        logger.error(f"Error uploading data to S3: {e}")
+
+class _ChunkedReader(io.RawIOBase):
+    """File-like wrapper that feeds generator chunks to upload_fileobj."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._leftover = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._leftover:
+            try:
+                self._leftover = next(self._chunks)
+            except StopIteration:
+                return 0
+        count = min(len(buffer), len(self._leftover))
+        buffer[:count] = self._leftover[:count]
+        self._leftover = self._leftover[count:]
+        return count
+
+def stream_nba_data_to_s3():
+    """Stream the NBA API response straight into S3 without buffering it all."""
+    try:
+        response = _session.get(nba_endpoint, stream=True, timeout=(3.05, 30))
+        response.raise_for_status()
+        # requests leaves the raw urllib3 stream undecoded, so tell it to
+        # gunzip any Content-Encoding the server applied before ijson reads it
+        response.raw.decode_content = True
+        records = ijson.items(response.raw, "item", use_float=True)
+
+        def jsonl_chunks():
+            buf = bytearray()
+            for record in records:
+                if orjson is not None:
+                    buf += orjson.dumps(record)
+                else:
+                    buf += json.dumps(record, separators=(",", ":")).encode("utf-8")
+                buf += b"\n"
+                if len(buf) >= 8 * 1024 * 1024:
+                    yield bytes(buf)
+                    buf.clear()
+            if buf:
+                yield bytes(buf)
+
+        if zstd is not None:
+            compressor = zstd.ZstdCompressor(level=3).compressobj()
+            extra_args = {"ContentEncoding": "zstd"}
+        else:
+            # wbits=31 makes zlib emit a gzip container incrementally
+            compressor = zlib.compressobj(1, zlib.DEFLATED, 31)
+            extra_args = {
+                "ContentEncoding": "gzip",
+                "ContentType": "application/x-ndjson",
+            }
+
+        def compressed_chunks(raw_chunks=jsonl_chunks()):
+            for chunk in raw_chunks:
+                out = compressor.compress(chunk)
+                if out:
+                    yield out
+            tail = compressor.flush()
+            if tail:
+                yield tail
+
+        chunks = compressed_chunks()
+
+        s3_client.upload_fileobj(
+            Fileobj=_ChunkedReader(chunks),
             Bucket=bucket_name,
-            Key=file_key,
-            Body=line_delimited_data
+            Key=_FILE_KEY,
+            ExtraArgs=extra_args,
+            Config=_transfer_config,
         )
-        message = f"Uploaded data to S3: {file_key}"
-        print(message)
-        log_to_cloudwatch(message)
+        logger.info(f"Streamed NBA data to S3: {_FILE_KEY}")
+        return True
     except Exception as e:
-        message = f"Error uploading data to S3: {e}"
-        print(message)
-        log_to_cloudwatch(message)
+        logger.error(f"Error streaming NBA data to S3: {e}")
+        return False
 
 def create_glue_table():
     """Create a Glue table for the data."""
     try:
+        try:
+            glue_client.get_table(DatabaseName=glue_database_name, Name="nba_players")
+            logger.info("Glue table 'nba_players' already exists.")
+            return
+        except glue_client.exceptions.EntityNotFoundException:
+            pass
         glue_client.create_table(
-            DatabaseName=glue_database_name,
-            TableInput={
-                "Name": "nba_players",
-                "StorageDescriptor": {
-                    "Columns": [
-                        {"Name": "PlayerID", "Type": "int"},
-                        {"Name": "FirstName", "Type": "string"},
-                        {"Name": "LastName", "Type": "string"},
-                        {"Name": "Team", "Type": "string"},
-                        {"Name": "Position", "Type": "string"},
-                        {"Name": "Points", "Type": "int"}
-                    ],
-                    "Location": f"s3://{bucket_name}/raw-data/",
-                    "InputFormat": "org.apache.hadoop.mapred.TextInputFormat",
-                    "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
-                    "SerdeInfo": {
-                        "SerializationLibrary": "org.openx.data.jsonserde.JsonSerDe"
-                    },
-                },
-                "TableType": "EXTERNAL_TABLE",
-            },
+            DatabaseName=glue_database_name, TableInput=_TABLE_INPUT
         )
-        message = "Glue table 'nba_players' created successfully."
-        print(message)
-        log_to_cloudwatch(message)
+        logger.info("Glue table 'nba_players' created successfully.")
     except Exception as e:
-        message = f"Error creating Glue table: {e}"
-        print(message)
-        log_to_cloudwatch(message)
+        logger.error(f"Error creating Glue table: {e}")
 
 def configure_athena():
     """Set up Athena output location."""
     try:
+        # Athena databases live in Glue, so a get_database probe avoids
+        # submitting a no-op CREATE DATABASE query on reruns
+        try:
+            glue_client.get_database(Name="nba_analytics")
+            logger.info("Athena database 'nba_analytics' already exists.")
+            return
+        except glue_client.exceptions.EntityNotFoundException:
+            pass
         athena_client.start_query_execution(
             QueryString="CREATE DATABASE IF NOT EXISTS nba_analytics",
             QueryExecutionContext={"Database": glue_database_name},
-            ResultConfiguration={"OutputLocation": athena_output_location},
+            ResultConfiguration=_ATHENA_RESULT_CONFIG,
         )
-        message = "Athena output location configured successfully."
-        print(message)
-        log_to_cloudwatch(message)
+        logger.info("Athena output location configured successfully.")
     except Exception as e:
-        message = f"Error configuring Athena: {e}"
-        print(message)
-        log_to_cloudwatch(message)
+        logger.error(f"Error configuring Athena: {e}")
 
 # Main workflow
 def main():
-    print("Setting up data lake for NBA sports analytics...")
+    logger.info("Setting up data lake for NBA sports analytics...")
     initialize_cloudwatch_logging()
     create_s3_bucket()
-    time.sleep(5)  # Ensure bucket creation propagates
-    create_glue_database()
-    nba_data = fetch_nba_data()
-    if nba_data:  # Only proceed if data was fetched successfully
-        upload_data_to_s3(nba_data)
-    create_glue_table()
-    configure_athena()
-    print("Data lake setup complete.")
+    # Wait until the bucket actually exists instead of sleeping blindly
+    s3_client.get_waiter("bucket_exists").wait(
+        Bucket=bucket_name, WaiterConfig={"Delay": 1, "MaxAttempts": 10}
+    )
+    # The pipeline is three independent chains: Glue database then table,
+    # API fetch then S3 upload, and the Athena setup. Running each chain
+    # on its own worker makes total wall time the longest chain rather
+    # than the sum of every step
+    def glue_chain():
+        create_glue_database()
+        create_glue_table()  # Table needs the database to exist
+
+    def data_chain():
+        if ijson is not None:
+            # Fused path: parse the HTTP response incrementally and feed it
+            # straight into the S3 upload, one pass, no full copy in memory
+            if stream_nba_data_to_s3():
+                return
+            logger.warning("Streaming upload failed; retrying buffered.")
+        nba_data = fetch_nba_data()
+        if nba_data:  # Only proceed if data was fetched successfully
+            upload_data_to_s3(nba_data)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(glue_chain),
+            executor.submit(data_chain),
+            executor.submit(configure_athena),
+        ]
+        for future in futures:
+            future.result()
+    logger.info("Data lake setup complete.")
 
 if __name__ == "__main__":
     main()